@@ -5,7 +5,9 @@ from rdkit.Geometry.rdGeometry import Point2D
 import os
 import numpy as np
 
-def draw_bde(smiles, bond_index, predicted_bde=None, actual_bde=None,figwidth=200):
+def draw_bde(
+    smiles, bond_index, predicted_bde=None, actual_bde=None,figwidth=200, molH=None
+):
     """Draw a molecule with a highlighted bond.
     Modified in Lite to also visualize its predicted BDE.
 
@@ -15,32 +17,107 @@ def draw_bde(smiles, bond_index, predicted_bde=None, actual_bde=None,figwidth=20
     predicted_bde (float, optional): Predicted bond dissociation energy.
     actual_bde (float, optional): Actual bond dissociation energy.
     figwidth (int, optional): Width of the figure.
+    molH (rdkit.Chem.Mol, optional): The molecule with explicit H's, if already
+        computed; saves an AddHs call when drawing many bonds of one molecule.
     
     """    
     mol = Chem.MolFromSmiles(smiles)
     bond_index = int(bond_index)
-
-    if mol.GetNumAtoms() > 20:
-        figwidth = 300
-    if mol.GetNumAtoms() > 40:
-        figwidth = 400
+    figwidth = _get_figwidth(mol, figwidth)
 
     if bond_index >= mol.GetNumBonds():
-        molH = Chem.AddHs(mol)
-        if bond_index >= molH.GetNumBonds():
-            raise RuntimeError(
-                f"Fewer than {bond_index} bonds in {smiles}: "
-                f"{molH.GetNumBonds()} total bonds"
-            )
-        bond = molH.GetBondWithIdx(bond_index)
-
-        start_atom = mol.GetAtomWithIdx(bond.GetBeginAtomIdx())
-        mol = Chem.AddHs(mol, onlyOnAtoms=[start_atom.GetIdx()])
-        bond_index = mol.GetNumBonds() - 1
+        if molH is None:
+            molH = Chem.AddHs(mol)
+        start_atom = _get_start_atom(smiles, molH, bond_index)
+        mol, bond_index = _add_bond_hydrogens(mol, start_atom)
 
     if not mol.GetNumConformers():
         rdDepictor.Compute2DCoords(mol)
 
+    return _draw_highlighted_bond(mol, bond_index, predicted_bde, actual_bde, figwidth)
+
+def draw_bdes(
+    smiles, bond_indices, predicted_bdes=None, actual_bdes=None, figwidth=200
+):
+    """Draw one image per bond of a molecule, as with `draw_bde`.
+    The molecule is parsed, hydrogenated and laid out once for all bonds,
+    rather than once per bond.
+
+    Parameters:
+    smiles (str): SMILES representation of the molecule.
+    bond_indices (list of int): Indices of the bonds to highlight.
+    predicted_bdes (list of float, optional): Predicted BDE for each bond.
+    actual_bdes (list of float, optional): Actual BDE for each bond.
+    figwidth (int, optional): Width of the figures.
+
+    Returns:
+    list of str: an SVG for each bond in bond_indices.
+
+    """
+    if predicted_bdes is None:
+        predicted_bdes = [None] * len(bond_indices)
+    if actual_bdes is None:
+        actual_bdes = [None] * len(bond_indices)
+
+    mol = Chem.MolFromSmiles(smiles)
+    figwidth = _get_figwidth(mol, figwidth)
+    molH = Chem.AddHs(mol)
+
+    # H's are added to the coordinate-free mol, as in draw_bde, so each drawing
+    # matches the one draw_bde would produce
+    heavy_mol = Chem.Mol(mol)
+    rdDepictor.Compute2DCoords(heavy_mol)
+
+    # Bonds to H are drawn on a copy with H's added to their start atom, which
+    # is shared between all the H bonds on that atom
+    h_mols = {}
+
+    svgs = []
+    for bond_index, predicted_bde, actual_bde in zip(
+        bond_indices, predicted_bdes, actual_bdes
+    ):
+        bond_index = int(bond_index)
+        draw_mol = heavy_mol
+
+        if bond_index >= mol.GetNumBonds():
+            start_atom = _get_start_atom(smiles, molH, bond_index)
+            if start_atom not in h_mols:
+                mol_h, h_bond_index = _add_bond_hydrogens(mol, start_atom)
+                rdDepictor.Compute2DCoords(mol_h)
+                h_mols[start_atom] = (mol_h, h_bond_index)
+            draw_mol, bond_index = h_mols[start_atom]
+
+        svgs += [
+            _draw_highlighted_bond(
+                draw_mol, bond_index, predicted_bde, actual_bde, figwidth
+            )
+        ]
+
+    return svgs
+
+def _get_figwidth(mol, figwidth):
+    if mol.GetNumAtoms() > 20:
+        figwidth = 300
+    if mol.GetNumAtoms() > 40:
+        figwidth = 400
+    return figwidth
+
+def _get_start_atom(smiles, molH, bond_index):
+    if bond_index >= molH.GetNumBonds():
+        raise RuntimeError(
+            f"Fewer than {bond_index} bonds in {smiles}: "
+            f"{molH.GetNumBonds()} total bonds"
+        )
+    return molH.GetBondWithIdx(bond_index).GetBeginAtomIdx()
+
+def _add_bond_hydrogens(mol, start_atom):
+    """Add explicit H's to start_atom, returning the new molecule and the index
+    of a bond to one of those H's.
+    """
+    mol = Chem.AddHs(mol, onlyOnAtoms=[start_atom])
+    return mol, mol.GetNumBonds() - 1
+
+def _draw_highlighted_bond(mol, bond_index, predicted_bde, actual_bde, figwidth):
     drawer = rdMolDraw2D.MolDraw2DSVG(figwidth, figwidth)
     drawer.drawOptions().fixedBondLength = 30
     drawer.drawOptions().highlightBondWidthMultiplier = 20
@@ -69,18 +146,7 @@ def draw_bde(smiles, bond_index, predicted_bde=None, actual_bde=None,figwidth=20
 
 def draw_mol_outlier(smiles, missing_atoms, missing_bonds, figsize=(300, 300)):
     mol = Chem.MolFromSmiles(smiles)
-    missing_bonds_adjusted = []
-    for bond_index in missing_bonds:
-
-        if bond_index >= mol.GetNumBonds():
-            molH = Chem.AddHs(mol)
-            bond = molH.GetBondWithIdx(int(bond_index))
-
-            start_atom = mol.GetAtomWithIdx(bond.GetBeginAtomIdx())
-            mol = Chem.AddHs(mol, onlyOnAtoms=[start_atom.GetIdx()])
-            bond_index = mol.GetNumBonds() - 1
-
-        missing_bonds_adjusted += [int(bond_index)]
+    mol, missing_bonds_adjusted = _add_missing_bond_hydrogens(mol, missing_bonds)
 
     if not mol.GetNumConformers():
         rdDepictor.Compute2DCoords(mol)
@@ -98,6 +164,40 @@ def draw_mol_outlier(smiles, missing_atoms, missing_bonds, figsize=(300, 300)):
 
     return svg
 
+def _add_missing_bond_hydrogens(mol, missing_bonds):
+    """Add explicit H's for any bonds to H in missing_bonds, returning the new
+    molecule and the index of each missing bond within it.
+    """
+    num_bonds = mol.GetNumBonds()
+
+    # Bonds to H only exist in the hydrogenated molecule. Look up their start
+    # atoms in a single AddHs copy, then add H's to just those atoms at once.
+    h_bond_start_atoms = {}
+    molH = None
+    for bond_index in missing_bonds:
+        bond_index = int(bond_index)
+        if bond_index >= num_bonds:
+            if molH is None:
+                molH = Chem.AddHs(mol)
+            bond = molH.GetBondWithIdx(bond_index)
+            h_bond_start_atoms[bond_index] = bond.GetBeginAtomIdx()
+
+    if h_bond_start_atoms:
+        mol = Chem.AddHs(mol, onlyOnAtoms=sorted(set(h_bond_start_atoms.values())))
+
+        # Highlight the last H bond added to each start atom
+        added_h_bond = {}
+        for bond_index in range(num_bonds, mol.GetNumBonds()):
+            added_h_bond[mol.GetBondWithIdx(bond_index).GetBeginAtomIdx()] = bond_index
+
+    missing_bonds_adjusted = [
+        int(bond_index)
+        if bond_index < num_bonds
+        else added_h_bond[h_bond_start_atoms[int(bond_index)]]
+        for bond_index in missing_bonds
+    ]
+    return mol, missing_bonds_adjusted
+
 def draw_mol(smiles, figsize=(300, 300)):
     mol = Chem.MolFromSmiles(smiles)
     rdDepictor.Compute2DCoords(mol)
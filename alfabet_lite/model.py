@@ -3,7 +3,7 @@ from typing import Dict, List, Tuple
 
 import numpy as np
 import pandas as pd
-import rdkit.Chem
+from joblib import Parallel, delayed
 from tqdm import tqdm
 from pooch import retrieve, Untar
 
@@ -11,28 +11,114 @@ import tensorflow as tf
 
 from . import _model_files_baseurl
 from .fragment import Molecule, get_fragments
-from .preprocessor import get_features, preprocessor
+from .preprocessor import (
+    get_features,
+    has_cached_features,
+    preprocessor,
+    prune_feature_cache,
+)
 
 """
 Merged some functions from predict.py into this file and dropped prediction.py.
 """
 
-model_files = retrieve(
-    _model_files_baseurl + "model.tar.gz",
-    known_hash="sha256:f1c2b9436f2d18c76b45d95140e6"
-    "a08c096250bd5f3e2b412492ca27ab38ad0c",
-    processor=Untar(extract_dir="model"),
-)
+# The model and reference data are loaded on first use, so importing this module
+# doesn't download files or build the keras model
+_model = None
+_bde_dft = None
+_bde_lookup = None
+_infer_fns = {}
+_use_xla = True
+
+
+def _get_model() -> tf.keras.Model:
+    global _model
+    if _model is None:
+        model_files = retrieve(
+            _model_files_baseurl + "model.tar.gz",
+            known_hash="sha256:f1c2b9436f2d18c76b45d95140e6"
+            "a08c096250bd5f3e2b412492ca27ab38ad0c",
+            processor=Untar(extract_dir="model"),
+        )
+        _model = tf.keras.models.load_model(os.path.dirname(model_files[0]))
+    return _model
+
+
+def _get_bde_dft() -> pd.DataFrame:
+    global _bde_dft
+    if _bde_dft is None:
+        _bde_dft = pd.read_csv(
+            retrieve(
+                _model_files_baseurl + "bonds_for_neighbors.csv.gz",
+                known_hash="sha256:d4fb825c42d790d4b2b4bd5dc2d"
+                "87c844932e2da82992a31d7521ce51395adb1",
+            )
+        )
+    return _bde_dft
+
+
+def _get_infer(jit_compile: bool = True):
+    """A tf.function running the model on a batch, avoiding the per-batch overhead
+    of keras' predict loop. Traced once per input shape, and compiled with XLA if
+    jit_compile is set."""
+    if jit_compile not in _infer_fns:
+        # Load the model eagerly, rather than while tracing
+        model = _get_model()
+        _infer_fns[jit_compile] = tf.function(
+            lambda inputs: model(inputs, training=False), jit_compile=jit_compile
+        )
+    return _infer_fns[jit_compile]
+
+
+def _run_model(batched_dataset, verbose: bool = False) -> Tuple[np.ndarray, np.ndarray]:
+    """Predict the BDEs and BDFEs for each batch, using XLA where it's supported"""
+    global _use_xla
+    batches = iter(tqdm(batched_dataset, disable=not verbose))
+    infer = _get_infer(jit_compile=_use_xla)
+
+    outputs = []
+    if _use_xla:
+        # The first call traces and compiles the model. XLA isn't available on
+        # every backend (e.g. tensorflow-metal) or for every op, so fall back to a
+        # regular graph function if it fails. Errors on later batches propagate.
+        first_batch = next(batches, None)
+        if first_batch is not None:
+            try:
+                outputs += [infer(first_batch)]
+            except tf.errors.OpError:
+                _use_xla = False
+                infer = _get_infer(jit_compile=False)
+                outputs += [infer(first_batch)]
+
+    outputs += [infer(batch) for batch in batches]
+
+    bdes = tf.concat([bde for bde, _ in outputs], axis=0).numpy()
+    bdfes = tf.concat([bdfe for _, bdfe in outputs], axis=0).numpy()
+    return bdes, bdfes
+
+
+def _get_bde_lookup() -> Dict[Tuple[str, int], Tuple[float, float, str]]:
+    """(molecule, bond_index) -> (bde, bdfe, set) for the DFT reference data"""
+    global _bde_lookup
+    if _bde_lookup is None:
+        bde_dft = _get_bde_dft()
+        _bde_lookup = dict(
+            zip(
+                zip(bde_dft["molecule"], bde_dft["bond_index"]),
+                zip(bde_dft["bde"], bde_dft["bdfe"], bde_dft["set"]),
+            )
+        )
+    return _bde_lookup
 
-model = tf.keras.models.load_model(os.path.dirname(model_files[0]))
 
-bde_dft = pd.read_csv(
-    retrieve(
-        _model_files_baseurl + "bonds_for_neighbors.csv.gz",
-        known_hash="sha256:d4fb825c42d790d4b2b4bd5dc2d"
-        "87c844932e2da82992a31d7521ce51395adb1",
-    )
-)
+def __getattr__(name):
+    # Keep `model.model` and `model.bde_dft` working as module attributes
+    if name == "model":
+        return _get_model()
+    if name == "bde_dft":
+        return _get_bde_dft()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 def validate_inputs(inputs: Dict) -> Tuple[bool, np.ndarray, np.ndarray]:
     """Check the given SMILES to ensure it's present in the model's
@@ -42,10 +128,12 @@ def validate_inputs(inputs: Dict) -> Tuple[bool, np.ndarray, np.ndarray]:
     (is_outlier, missing_atom, missing_bond)
 
     """
-    inputs = {key: np.asarray(val) for key, val in inputs.items()}
+    atom = np.asarray(inputs["atom"])
+    bond = np.asarray(inputs["bond"])
+    bond_indices = np.asarray(inputs["bond_indices"])
 
-    missing_bond = np.array(list(set(inputs["bond_indices"][inputs["bond"] == 1])))
-    missing_atom = np.arange(len(inputs["atom"]))[inputs["atom"] == 1]
+    missing_bond = np.unique(bond_indices[bond == 1])
+    missing_atom = np.flatnonzero(atom == 1)
 
     is_outlier = (missing_bond.size != 0) | (missing_atom.size != 0)
 
@@ -55,13 +143,52 @@ def validate_inputs(inputs: Dict) -> Tuple[bool, np.ndarray, np.ndarray]:
 
 def get_max_bonds(molecule_list: List[Molecule]):
     def num_bonds(molecule):
-        molH = rdkit.Chem.AddHs(molecule.mol)
-        return molH.GetNumBonds()
+        # Each implicit H becomes one extra bond once H's are made explicit
+        mol = molecule.mol
+        return mol.GetNumBonds() + sum(atom.GetTotalNumHs() for atom in mol.GetAtoms())
 
     return max((num_bonds(molecule) for molecule in molecule_list))
 
 
-def predict(smiles_list, drop_duplicates=True, batch_size=1, verbose=False):
+def get_max_atoms(molecule_list: List[Molecule]):
+    def num_atoms(molecule):
+        mol = molecule.mol
+        return mol.GetNumAtoms() + sum(atom.GetTotalNumHs() for atom in mol.GetAtoms())
+
+    return max((num_atoms(molecule) for molecule in molecule_list))
+
+
+def _next_power_of_two(n: int) -> int:
+    return 1 << max(n - 1, 0).bit_length()
+
+
+def concat_fragments(fragments: List[pd.DataFrame]) -> pd.DataFrame:
+    """Stack the per-molecule fragment dataframes column by column.
+
+    Equivalent to ``pd.concat(fragments, ignore_index=True)`` for frames sharing
+    the same columns, but avoids pandas' per-frame index and alignment overhead
+    when joining many small dataframes.
+    """
+    fragments = [df for df in fragments if not df.empty]
+    if not fragments:
+        return pd.DataFrame()
+
+    return pd.DataFrame(
+        {
+            col: np.concatenate([df[col].to_numpy() for df in fragments])
+            for col in fragments[0].columns
+        }
+    )
+
+
+def predict(
+    smiles_list,
+    drop_duplicates=True,
+    batch_size=16,
+    verbose=False,
+    n_jobs=1,
+    use_cache=False,
+):
     """Predict the BDEs of each bond in a list of molecules.
 
     Parameters
@@ -70,8 +197,19 @@ def predict(smiles_list, drop_duplicates=True, batch_size=1, verbose=False):
         List of SMILES strings for each molecule
     drop_duplicates : bool, optional
         Whether to drop duplicate bonds (those with the same resulting radicals)
+    batch_size : int, optional
+        Number of molecules passed to the model at once
     verbose : bool, optional
         Whether to show a progress bar
+    n_jobs : int, optional
+        Number of worker processes used to featurize the molecules, as in
+        `joblib.Parallel`. Defaults to 1 (in-process); each worker imports
+        tensorflow, so more workers only pay off for large inputs.
+    use_cache : bool, optional
+        Whether to store each molecule's features in an on-disk cache under the
+        user's cache directory (see `preprocessor.feature_cache_dir`), so
+        repeated predictions for the same molecules skip preprocessing. Defaults
+        to False.
 
     Returns
     -------
@@ -94,56 +232,104 @@ def predict(smiles_list, drop_duplicates=True, batch_size=1, verbose=False):
     molecule_list = [Molecule(smiles=smiles) for smiles in smiles_list]
     smiles_list = [mol.smiles for mol in molecule_list]
 
-    pred_df = pd.concat(
-        (
+    pred_df = concat_fragments(
+        [
             get_fragments(mol, drop_duplicates=drop_duplicates)
             for mol in tqdm(molecule_list, disable=not verbose)
-        )
+        ]
     )
 
     max_bonds = get_max_bonds(molecule_list)
-    input_dataset = tf.data.Dataset.from_generator(
-        lambda: (
-            get_features(mol.smiles, max_num_edges=2 * max_bonds)
-            for mol in tqdm(molecule_list, disable=not verbose)
-        ),
+    max_atoms = get_max_atoms(molecule_list)
+
+    # The preprocessor holds the GIL for most of its work, so with n_jobs > 1 it's
+    # spread over worker processes rather than threads. Features are left
+    # unpadded (and padded by padded_batch below) so get_features' on-disk cache
+    # can be reused across different sets of molecules. Both the model and
+    # validate_inputs read from this list.
+    if use_cache:
+        num_uncached = sum(not has_cached_features(s) for s in smiles_list)
+    features_list = Parallel(n_jobs=n_jobs, batch_size=16)(
+        delayed(get_features)(smiles, use_cache=use_cache) for smiles in smiles_list
+    )
+    if use_cache and num_uncached:
+        # Only new entries can push the cache over its limit
+        prune_feature_cache()
+
+    is_valid = {
+        smiles: not validate_inputs(features)[0]
+        for smiles, features in zip(smiles_list, features_list)
+    }
+
+    # Round the padded sizes up to powers of two and fill out the final batch with
+    # empty molecules, so that every batch has one of a few shapes and the
+    # compiled model is reused across batches and calls. Predictions for the
+    # filler molecules are never read.
+    num_atoms = _next_power_of_two(max_atoms)
+    num_edges = _next_power_of_two(2 * max_bonds)
+    empty_features = {
+        key: np.zeros(
+            [0 if dim is None else dim for dim in spec.shape],
+            dtype=spec.dtype.as_numpy_dtype,
+        )
+        for key, spec in preprocessor.output_signature.items()
+    }
+    num_filler = -len(features_list) % batch_size
+
+    model_dataset = tf.data.Dataset.from_generator(
+        lambda: iter(features_list + [empty_features] * num_filler),
         output_signature=preprocessor.output_signature,
-    ).cache()
+    )
 
-    batched_dataset = input_dataset.padded_batch(batch_size=batch_size).prefetch(
-        tf.data.experimental.AUTOTUNE
+    options = tf.data.Options()
+    options.experimental_optimization.apply_default_optimizations = True
+    options.experimental_optimization.map_and_batch_fusion = True
+    # Predictions are matched back to smiles_list by position
+    options.deterministic = True
+    # Keep tf.data's threads from competing with the intra-op pool used by the
+    # model, leaving a couple of cores free for inference
+    options.threading.private_threadpool_size = max(1, (os.cpu_count() or 1) - 2)
+    options.threading.max_intra_op_parallelism = 1
+
+    batched_dataset = (
+        model_dataset.padded_batch(
+            batch_size=batch_size,
+            padded_shapes={
+                "atom": [num_atoms],
+                "bond": [num_edges],
+                "connectivity": [num_edges, 2],
+                "bond_indices": [num_edges],
+            },
+        )
+        .with_options(options)
+        .prefetch(tf.data.AUTOTUNE)
     )
 
-    bdes, bdfes = model.predict(batched_dataset, verbose=1 if verbose else 0)
+    bdes, bdfes = _run_model(batched_dataset, verbose=verbose)
 
-    bde_df = (
-        pd.DataFrame(bdes.squeeze(axis=-1), index=smiles_list)
-        .T.unstack()
-        .reindex(pred_df[["molecule", "bond_index"]])
-    )
-    bdfe_df = (
-        pd.DataFrame(bdfes.squeeze(axis=-1), index=smiles_list)
-        .T.unstack()
-        .reindex(pred_df[["molecule", "bond_index"]])
-    )
+    # Gather each fragment's prediction by (molecule row, bond index)
+    smiles_to_row = {smiles: i for i, smiles in enumerate(smiles_list)}
+    mol_rows = pred_df["molecule"].map(smiles_to_row).to_numpy()
+    bond_cols = pred_df["bond_index"].to_numpy()
 
-    pred_df["bde_pred"] = bde_df.values
-    pred_df["bdfe_pred"] = bdfe_df.values
+    pred_df["bde_pred"] = bdes[mol_rows, bond_cols, 0]
+    pred_df["bdfe_pred"] = bdfes[mol_rows, bond_cols, 0]
 
-    is_valid = pd.Series(
-        {
-            smiles: not validate_inputs(input_)[0]
-            for smiles, input_ in zip(smiles_list, input_dataset)
-        },
-        name="is_valid",
-    )
+    pred_df["is_valid"] = pred_df["molecule"].map(is_valid)
 
-    pred_df = pred_df.merge(is_valid, left_on="molecule", right_index=True, how="left")
-    pred_df = pred_df.merge(
-        bde_dft[["molecule", "bond_index", "bde", "bdfe", "set"]],
-        on=["molecule", "bond_index"],
-        how="left",
+    # Annotate with the DFT values (where known) by dictionary lookup, rather
+    # than a full merge against the reference dataframe
+    bde_lookup = _get_bde_lookup()
+    dft_values = pd.DataFrame(
+        [
+            bde_lookup.get(key, (np.nan, np.nan, np.nan))
+            for key in zip(pred_df["molecule"], pred_df["bond_index"])
+        ],
+        columns=["bde", "bdfe", "set"],
+        index=pred_df.index,
     )
+    for column in dft_values.columns:
+        pred_df[column] = dft_values[column]
 
     return pred_df
 
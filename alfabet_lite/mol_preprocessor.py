@@ -1,10 +1,18 @@
-from typing import Any, Callable, Dict, Hashable, Optional, Union
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Hashable,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+    Union,
+)
 from abc import ABC, abstractmethod
 import json
-from inspect import getmembers
 
 import numpy as np
-import networkx as nx
 import rdkit.Chem
 
 import tensorflow as tf
@@ -16,6 +24,22 @@ from .tokenizer import Tokenizer
 Ported Preprocessor class from nfp package.
 """
 
+class GraphData(NamedTuple):
+    """A lightweight stand-in for the networkx digraph used by nfp.
+
+    nodes
+        (node_index, node_dict) pairs, as from `nx_graph.nodes(data=True)`
+    edges
+        (start_node, end_node, edge_dict) triples with both directions of each
+        edge, as from `nx_graph.edges(data=True)`
+    graph
+        graph-level data, as from `nx_graph.graph`
+    """
+
+    nodes: List[Tuple[int, dict]]
+    edges: List[Tuple[int, int, dict]]
+    graph: dict
+
 class Preprocessor(ABC):
     """A base class for graph preprocessing from the nfp package.
 
@@ -30,8 +54,8 @@ class Preprocessor(ABC):
         self.output_dtype = output_dtype
 
     @abstractmethod
-    def create_nx_graph(self, structure: Any, *args, **kwargs) -> nx.DiGraph:
-        """Given an input structure object, convert it to a networkx digraph
+    def create_graph_data(self, structure: Any, *args, **kwargs) -> GraphData:
+        """Given an input structure object, convert it to a directed graph
         with node, edge, and graph features assigned.
 
         Parameters
@@ -44,8 +68,8 @@ class Preprocessor(ABC):
 
         Returns
         -------
-        nx.DiGraph
-            A networkx graph with the node, edge, and graph features set
+        GraphData
+            The graph's nodes and directed edges with their features set
         """
         pass
 
@@ -53,13 +77,13 @@ class Preprocessor(ABC):
     def get_edge_features(
         self, edge_data: list, max_num_edges: int
     ) -> Dict[str, np.ndarray]:
-        """Given a list of edge features from the nx.Graph, processes and
+        """Given a list of edge features from the graph, processes and
         concatenates them to an array.
 
         Parameters
         ----------
         edge_data
-            A list of edge data generated by `nx_graph.edges(data=True)`
+            A list of (start, end, edge_dict) triples from `GraphData.edges`
         max_num_edges
             If desired, this function should pad to a maximum number of edges
             passed from the `__call__` function.
@@ -76,13 +100,13 @@ class Preprocessor(ABC):
     def get_node_features(
         self, node_data: list, max_num_nodes: int
     ) -> Dict[str, np.ndarray]:
-        """Given a list of node features from the nx.Graph, processes and
+        """Given a list of node features from the graph, processes and
         concatenates them to an array.
 
         Parameters
         ----------
         node_data
-            A list of edge data generated by `nx_graph.nodes(data=True)`
+            A list of (index, node_dict) pairs from `GraphData.nodes`
         max_num_nodes
             If desired, this function should pad to a maximum number of nodes
             passed from the `__call__` function.
@@ -97,12 +121,12 @@ class Preprocessor(ABC):
 
     @abstractmethod
     def get_graph_features(self, graph_data: dict) -> Dict[str, np.ndarray]:
-        """Process the nx.graph features into a dictionary of arrays.
+        """Process the graph-level features into a dictionary of arrays.
 
         Parameters
         ----------
         graph_data
-            A dictionary of graph data generated by `nx_graph.graph`
+            A dictionary of graph data from `GraphData.graph`
 
         Returns
         -------
@@ -112,10 +136,8 @@ class Preprocessor(ABC):
         pass
 
     @staticmethod
-    def get_connectivity(
-        graph: nx.DiGraph, max_num_edges: int
-    ) -> Dict[str, np.ndarray]:
-        """Get the graph connectivity from the networkx graph
+    def get_connectivity(graph: GraphData, max_num_edges: int) -> Dict[str, np.ndarray]:
+        """Get the graph connectivity from the graph's edge list
 
         Parameters
         ----------
@@ -131,16 +153,21 @@ class Preprocessor(ABC):
             array of (node_index, node_index) pairs indicating the start and end
             nodes for each edge.
         """
+        num_edges = len(graph.edges)
         connectivity = np.zeros((max_num_edges, 2), dtype="int64")
-        if len(graph.edges) > 0:  # Handle odd case with no edges
-            connectivity[: len(graph.edges)] = np.asarray(graph.edges)
+        connectivity[:num_edges, 0] = np.fromiter(
+            (start for start, _, _ in graph.edges), dtype="int64", count=num_edges
+        )
+        connectivity[:num_edges, 1] = np.fromiter(
+            (end for _, end, _ in graph.edges), dtype="int64", count=num_edges
+        )
         return {"connectivity": connectivity}
 
     def __call__(
         self,
         structure: Any,
         *args,
-        train: bool = False,
+        train: Optional[bool] = False,
         max_num_nodes: Optional[int] = None,
         max_num_edges: Optional[int] = None,
         **kwargs,
@@ -153,7 +180,8 @@ class Preprocessor(ABC):
         structure
             An input graph structure (i.e., molecule, crystal, etc.)
         train
-            A training flag passed to `Tokenizer` member attributes
+            A training flag passed to `Tokenizer` member attributes. If None,
+            the tokenizers are left in their current mode.
         max_num_nodes
             A size attribute passed to `get_node_features`, defaults to the
             number of nodes in the current graph
@@ -161,36 +189,43 @@ class Preprocessor(ABC):
             A size attribute passed to `get_edge_features`, defaults to the
             number of edges in the current graph
         kwargs
-            Additional features or parameters passed to `construct_nx_graph`
+            Additional features or parameters passed to `create_graph_data`
 
         Returns
         -------
         Dict[str, np.ndarray]
             A dictionary of key, array pairs as a single sample.
         """
-        nx_graph = self.create_nx_graph(structure, *args, **kwargs)
+        graph = self.create_graph_data(structure, *args, **kwargs)
 
-        max_num_edges = len(nx_graph.edges) if max_num_edges is None else max_num_edges
+        max_num_edges = len(graph.edges) if max_num_edges is None else max_num_edges
         assert (
-            len(nx_graph.edges) <= max_num_edges
+            len(graph.edges) <= max_num_edges
         ), "max_num_edges too small for given input"
 
-        max_num_nodes = len(nx_graph.nodes) if max_num_nodes is None else max_num_nodes
+        max_num_nodes = len(graph.nodes) if max_num_nodes is None else max_num_nodes
         assert (
-            len(nx_graph.nodes) <= max_num_nodes
+            len(graph.nodes) <= max_num_nodes
         ), "max_num_nodes too small for given input"
 
-        # Make sure that Tokenizer classes are correctly initialized
-        for _, tokenizer in getmembers(self, lambda x: type(x) == Tokenizer):
-            tokenizer.train = train
+        # Make sure that Tokenizer classes are correctly initialized. Only the
+        # instance dict is scanned; getmembers would also evaluate every
+        # property (output_signature, etc.) on each call.
+        if train is not None:
+            for tokenizer in self._tokenizers():
+                tokenizer.train = train
 
-        node_features = self.get_node_features(nx_graph.nodes(data=True), max_num_nodes)
-        edge_features = self.get_edge_features(nx_graph.edges(data=True), max_num_edges)
-        graph_features = self.get_graph_features(nx_graph.graph)
-        connectivity = self.get_connectivity(nx_graph, max_num_edges)
+        node_features = self.get_node_features(graph.nodes, max_num_nodes)
+        edge_features = self.get_edge_features(graph.edges, max_num_edges)
+        graph_features = self.get_graph_features(graph.graph)
+        connectivity = self.get_connectivity(graph, max_num_edges)
 
         return {**node_features, **edge_features, **graph_features, **connectivity}
 
+    def _tokenizers(self) -> List[Tokenizer]:
+        """The Tokenizer member attributes of this preprocessor"""
+        return [val for val in vars(self).values() if type(val) is Tokenizer]
+
     def construct_feature_matrices(
         self, *args, train=False, **kwargs
     ) -> Dict[str, np.ndarray]:
@@ -253,26 +288,38 @@ class MolPreprocessor(Preprocessor):
         self.atom_features = atom_features
         self.bond_features = bond_features
 
-    def create_nx_graph(self, mol: rdkit.Chem.Mol, **kwargs) -> nx.DiGraph:
-        g = nx.Graph(mol=mol)
-        g.add_nodes_from(((atom.GetIdx(), {"atom": atom}) for atom in mol.GetAtoms()))
-        g.add_edges_from(
-            (
-                (bond.GetBeginAtomIdx(), bond.GetEndAtomIdx(), {"bond": bond})
-                for bond in mol.GetBonds()
-            )
-        )
-        return nx.DiGraph(g)
+    def create_graph_data(self, mol: rdkit.Chem.Mol, **kwargs) -> GraphData:
+        nodes = [(atom.GetIdx(), {"atom": atom}) for atom in mol.GetAtoms()]
+
+        # Emit both directions of each bond, grouped by start atom and in bond
+        # order, matching the edge order of the nx.DiGraph used previously
+        neighbors = [[] for _ in nodes]
+        for bond in mol.GetBonds():
+            start, end = bond.GetBeginAtomIdx(), bond.GetEndAtomIdx()
+            neighbors[start].append((end, {"bond": bond}))
+            neighbors[end].append((start, {"bond": bond}))
+
+        edges = [
+            (start, end, bond_dict)
+            for start, atom_neighbors in enumerate(neighbors)
+            for end, bond_dict in atom_neighbors
+        ]
+        return GraphData(nodes=nodes, edges=edges, graph={"mol": mol})
 
     def get_edge_features(
         self, edge_data: list, max_num_edges
     ) -> Dict[str, np.ndarray]:
         bond_feature_matrix = np.zeros(max_num_edges, dtype=self.output_dtype)
-        for n, (start_atom, end_atom, bond_dict) in enumerate(edge_data):
-            flipped = start_atom == bond_dict["bond"].GetEndAtomIdx()
-            bond_feature_matrix[n] = self.bond_tokenizer(
-                self.bond_features(bond_dict["bond"], flipped=flipped)
-            )
+        bond_feature_matrix[: len(edge_data)] = self.bond_tokenizer.batch(
+            (
+                self.bond_features(
+                    bond_dict["bond"],
+                    flipped=start_atom == bond_dict["bond"].GetEndAtomIdx(),
+                )
+                for start_atom, _, bond_dict in edge_data
+            ),
+            dtype=self.output_dtype,
+        )
 
         return {"bond": bond_feature_matrix}
 
@@ -280,10 +327,11 @@ class MolPreprocessor(Preprocessor):
         self, node_data: list, max_num_nodes
     ) -> Dict[str, np.ndarray]:
         atom_feature_matrix = np.zeros(max_num_nodes, dtype=self.output_dtype)
-        for n, atom_dict in node_data:
-            atom_feature_matrix[n] = self.atom_tokenizer(
-                self.atom_features(atom_dict["atom"])
-            )
+        # Nodes are numbered consecutively from zero
+        atom_feature_matrix[: len(node_data)] = self.atom_tokenizer.batch(
+            (self.atom_features(atom_dict["atom"]) for _, atom_dict in node_data),
+            dtype=self.output_dtype,
+        )
         return {"atom": atom_feature_matrix}
 
     def get_graph_features(self, graph_data: dict) -> Dict[str, np.ndarray]:
@@ -337,19 +385,22 @@ class SmilesPreprocessor(MolPreprocessor):
         super(SmilesPreprocessor, self).__init__(*args, **kwargs)
         self.explicit_hs = explicit_hs
 
-    def create_nx_graph(self, smiles: str, *args, **kwargs) -> nx.DiGraph:
+    def create_graph_data(self, smiles: str, *args, **kwargs) -> GraphData:
         mol = rdkit.Chem.MolFromSmiles(smiles)
         if self.explicit_hs:
             mol = rdkit.Chem.AddHs(mol)
-        return super(SmilesPreprocessor, self).create_nx_graph(mol, *args, **kwargs)
+        return super(SmilesPreprocessor, self).create_graph_data(mol, *args, **kwargs)
 
 class BondIndexPreprocessor(MolPreprocessor):
     def get_edge_features(
         self, edge_data: list, max_num_edges
     ) -> Dict[str, np.ndarray]:
         bond_indices = np.zeros(max_num_edges, dtype=self.output_dtype)
-        for n, (_, _, edge_dict) in enumerate(edge_data):
-            bond_indices[n] = edge_dict["bond"].GetIdx()
+        bond_indices[: len(edge_data)] = np.fromiter(
+            (edge_dict["bond"].GetIdx() for _, _, edge_dict in edge_data),
+            dtype=self.output_dtype,
+            count=len(edge_data),
+        )
         edge_features = super(BondIndexPreprocessor, self).get_edge_features(
             edge_data, max_num_edges
         )
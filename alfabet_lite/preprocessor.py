@@ -1,8 +1,14 @@
+import hashlib
+import os
+import tempfile
+import time
+import zipfile
+
 import numpy as np
 
-from pooch import retrieve
+from pooch import os_cache, retrieve
 
-from . import features
+from . import __version__, features
 from .features import get_ring_size
 from .mol_preprocessor import SmilesBondIndexPreprocessor
 
@@ -45,26 +51,143 @@ preprocessor = SmilesBondIndexPreprocessor(
     output_dtype="int64",
 )
 
+_preprocessor_hash = "412d15ca4d0e8b5030e9b497f566566922818ff355b8ee677a91dd23696878ac"
+
 preprocessor.from_json(
     retrieve(
         "https://github.com/pstjohn/alfabet-models/releases/download/v0.1.1/preprocessor.json",
-        known_hash="412d15ca4d0e8b5030e9b497f566566922818ff355b8ee677a91dd23696878ac",
+        known_hash=_preprocessor_hash,
     )
 )
 
-
-def get_features(smiles: str, pad: bool = False, **kwargs) -> dict:
+# The preprocessor is only used for inference, so put its tokenizers in test mode
+# once here rather than on every call.
+preprocessor.atom_tokenizer.train = False
+preprocessor.bond_tokenizer.train = False
+
+# Features can be stored on disk per input (opt-in, with `use_cache`), so
+# molecules seen in earlier runs skip preprocessing. The cache lives in the user's
+# own cache directory, and entries are keyed on the package version and
+# preprocessor data as well as the input so changes to either never serve stale
+# features. The least recently used entries are removed by `prune_feature_cache`.
+feature_cache_dir = os.path.join(os_cache("alfabet_lite"), "features")
+max_cached_features = 100_000
+# Temporary files older than this were left behind by an interrupted write
+_stale_tmp_seconds = 3600
+
+
+def _feature_cache_path(smiles: str, **kwargs) -> str:
+    key = "|".join(
+        [__version__, _preprocessor_hash, smiles]
+        + [f"{key}={val}" for key, val in sorted(kwargs.items())]
+    )
+    filename = hashlib.sha1(key.encode()).hexdigest() + ".npz"
+    return os.path.join(feature_cache_dir, filename)
+
+
+def _load_cached_features(path: str):
+    try:
+        with np.load(path) as data:
+            features = dict(data)
+    except (OSError, ValueError, zipfile.BadZipFile):
+        return None
+
+    # Mark the entry as recently used. The entry may have been pruned by another
+    # process in the meantime, or the cache may be read-only
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+    return features
+
+
+def _save_cached_features(path: str, features: dict) -> None:
+    # Write to a temporary file first, so concurrent workers never read a
+    # partially written entry
+    tmp_path = None
+    try:
+        os.makedirs(feature_cache_dir, exist_ok=True)
+        with tempfile.NamedTemporaryFile(
+            dir=feature_cache_dir, suffix=".tmp", delete=False
+        ) as f:
+            tmp_path = f.name
+            np.savez(f, **features)
+        os.replace(tmp_path, path)
+    except OSError:
+        if tmp_path is not None:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+
+def has_cached_features(smiles: str, **kwargs) -> bool:
+    """Whether features for the given input are already in the on-disk cache"""
+    return os.path.exists(_feature_cache_path(smiles, **kwargs))
+
+
+def prune_feature_cache(max_entries: int = max_cached_features) -> None:
+    """Remove the least recently used cached features beyond max_entries.
+
+    Entries are only sorted and removed once the cache is more than 10% over
+    max_entries, so repeated calls on a cache near its limit stay cheap. Temporary
+    files left behind by interrupted writes are removed as well.
+    """
+    try:
+        scanned = list(os.scandir(feature_cache_dir))
+    except OSError:
+        return
+
+    def last_used(entry):
+        try:
+            return entry.stat().st_mtime
+        except OSError:
+            return 0.0
+
+    stale_before = time.time() - _stale_tmp_seconds
+    for entry in scanned:
+        if entry.name.endswith(".tmp") and last_used(entry) < stale_before:
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+
+    entries = [entry for entry in scanned if entry.name.endswith(".npz")]
+    if len(entries) <= max_entries + max_entries // 10:
+        return
+
+    entries.sort(key=last_used, reverse=True)
+    for entry in entries[max_entries:]:
+        try:
+            os.remove(entry.path)
+        except OSError:
+            pass
+
+
+def get_features(
+    smiles: str, pad: bool = False, use_cache: bool = False, **kwargs
+) -> dict:
     """Run the preprocessor on the given SMILES string
 
     Args:
         smiles (str): the input molecule
         pad (bool, optional): whether to left-pad the inputs with zeros in preparation
             for tf-serving's padding behavior. Defaults to False.
+        use_cache (bool, optional): whether to read and write the features from the
+            on-disk cache in `feature_cache_dir`. Defaults to False.
 
     Returns:
         dict: numpy array inputs with atom, bond, connectivity, and bond_indicies.
     """
-    features = preprocessor(smiles, train=False, **kwargs)
+    features = None
+    if use_cache:
+        cache_path = _feature_cache_path(smiles, **kwargs)
+        features = _load_cached_features(cache_path)
+
+    if features is None:
+        features = preprocessor(smiles, train=None, **kwargs)
+        if use_cache:
+            _save_cached_features(cache_path, features)
 
     if not pad:
         return features
@@ -2,6 +2,8 @@
 Ported Tokenizer class from the nfp package.
 """
 
+import numpy as np
+
 class Tokenizer(object):
     """A class to turn arbitrary inputs into integer classes."""
 
@@ -32,6 +34,24 @@ class Tokenizer(object):
                 self.unknown += [item]
                 return self._data["unk"]
 
+    def batch(self, items, dtype="int64") -> np.ndarray:
+        """Tokenize a sequence of items at once, returning an integer array.
+        Equivalent to calling the tokenizer on each item in turn.
+
+        """
+        items = list(items)
+        if self.train:
+            return np.fromiter(
+                (self(item) for item in items), dtype=dtype, count=len(items)
+            )
+
+        unk = self._data["unk"]
+        tokens = np.fromiter(
+            (self._data.get(item, unk) for item in items), dtype=dtype, count=len(items)
+        )
+        self.unknown += [item for item in items if item not in self._data]
+        return tokens
+
     def _add_token(self, item):
         self.num_classes += 1
         self._data[item] = self.num_classes
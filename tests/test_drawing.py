@@ -0,0 +1,47 @@
+from rdkit import Chem
+
+from alfabet_lite import drawing
+
+
+def check_missing_bonds(smiles, missing_bonds, expected):
+    mol = Chem.MolFromSmiles(smiles)
+    molH = Chem.AddHs(mol)
+    mol, adjusted = drawing._add_missing_bond_hydrogens(mol, missing_bonds)
+    assert adjusted == expected
+
+    # Each bond to H is highlighted on an H attached to the same start atom
+    for bond_index, adjusted_index in zip(missing_bonds, adjusted):
+        bond = molH.GetBondWithIdx(bond_index)
+        adjusted_bond = mol.GetBondWithIdx(adjusted_index)
+        assert adjusted_bond.GetBeginAtomIdx() == bond.GetBeginAtomIdx()
+        assert adjusted_bond.GetEndAtom().GetSymbol() == bond.GetEndAtom().GetSymbol()
+
+
+def test_missing_bonds_same_start_atom():
+    # Bonds 2-4 are the C0-H bonds and 5-6 the C1-H bonds of CCO
+    check_missing_bonds("CCO", [3, 4, 6, 1], [4, 4, 6, 1])
+
+
+def test_missing_bonds_different_start_atoms():
+    # The O-H bond is added after the C0-H bonds, so bond 2 must still be
+    # remapped to a C0-H bond rather than left pointing at the new O-H bond
+    check_missing_bonds("CCO", [7, 2], [5, 4])
+
+
+def test_draw_mol_outlier():
+    svg = drawing.draw_mol_outlier("CCO", missing_atoms=[2], missing_bonds=[7, 2])
+    assert svg.startswith("<?xml")
+
+
+def test_draw_bdes():
+    # Covers heavy-atom bonds (0, 1), several bonds to H on one atom (2, 4) and
+    # a bond to H on another atom (7)
+    smiles = "CCO"
+    bond_indices = [0, 2, 1, 4, 7]
+    predicted_bdes = [88.0, 98.5, 94.1, 98.5, 104.2]
+
+    svgs = drawing.draw_bdes(smiles, bond_indices, predicted_bdes)
+    assert svgs == [
+        drawing.draw_bde(smiles, bond_index, predicted_bde)
+        for bond_index, predicted_bde in zip(bond_indices, predicted_bdes)
+    ]
@@ -1,5 +1,20 @@
+import os
+
 import numpy as np
-from alfabet_lite import model
+import pandas as pd
+import pytest
+import rdkit.Chem
+import tensorflow as tf
+
+from alfabet_lite import model, preprocessor
+from alfabet_lite.fragment import Molecule, get_fragments
+
+
+@pytest.fixture(autouse=True)
+def feature_cache_dir(tmp_path, monkeypatch):
+    # Keep the tests from reading or writing the user's feature cache
+    monkeypatch.setattr(preprocessor, "feature_cache_dir", str(tmp_path))
+    return tmp_path
 
 
 def test_predict():
@@ -39,3 +54,89 @@ def test_duplicates():
 def test_non_canonical_smiles():
     smiles = "CC(=O)OCC1=C\CC/C(C)=C/CC[C@@]2(C)CC[C@@](C(C)C)(/C=C/1)O2"
     assert len(model.predict([smiles])) == 24
+
+
+def test_concat_fragments():
+    smiles = ["CC", "[Cl-]", "NCCO"]
+    fragments = [get_fragments(Molecule(smiles=s)) for s in smiles]
+    # [Cl-] has no bonds to break
+    assert fragments[1].empty
+    expected = pd.concat(fragments, ignore_index=True)
+    pd.testing.assert_frame_equal(model.concat_fragments(fragments), expected)
+
+
+def test_feature_cache(feature_cache_dir):
+    expected = preprocessor.get_features("NCCO")
+    assert not list(feature_cache_dir.glob("*.npz"))
+
+    preprocessor.get_features("NCCO", use_cache=True)
+    cached = preprocessor.get_features("NCCO", use_cache=True)
+
+    assert len(list(feature_cache_dir.glob("*.npz"))) == 1
+    for key, val in expected.items():
+        np.testing.assert_array_equal(cached[key], val)
+
+    assert preprocessor.has_cached_features("NCCO")
+    assert not preprocessor.has_cached_features("CCO")
+
+    stale_tmp = feature_cache_dir / "stale.tmp"
+    stale_tmp.touch()
+    os.utime(stale_tmp, (0, 0))
+
+    preprocessor.prune_feature_cache(max_entries=0)
+    assert not list(feature_cache_dir.glob("*.npz"))
+    assert not stale_tmp.exists()
+
+
+def test_predict_feature_cache(feature_cache_dir):
+    expected = model.predict(["CC", "NCCO"])
+    assert not list(feature_cache_dir.glob("*.npz"))
+
+    model.predict(["CC", "NCCO"], use_cache=True)
+    assert len(list(feature_cache_dir.glob("*.npz"))) == 2
+
+    results = model.predict(["CC", "NCCO"], use_cache=True)
+    pd.testing.assert_frame_equal(results, expected)
+
+
+def test_max_bonds_and_atoms():
+    smiles = ["CC", "NCCO", "B", "c1ccccc1", "[CH2]C(=O)[O-]"]
+    molecules = [Molecule(smiles=s) for s in smiles]
+    molHs = [rdkit.Chem.AddHs(rdkit.Chem.MolFromSmiles(s)) for s in smiles]
+
+    assert model.get_max_bonds(molecules) == max(m.GetNumBonds() for m in molHs)
+    assert model.get_max_atoms(molecules) == max(m.GetNumAtoms() for m in molHs)
+
+
+def test_xla_inference():
+    features = preprocessor.get_features("NCCO", use_cache=False)
+    batch = {key: val[np.newaxis] for key, val in features.items()}
+
+    expected = model._get_model()(batch, training=False)
+    try:
+        compiled = model._get_infer(jit_compile=True)(batch)
+    except tf.errors.OpError as ex:
+        pytest.skip(f"XLA compilation not available: {ex.message}")
+
+    for expected_output, compiled_output in zip(expected, compiled):
+        np.testing.assert_allclose(compiled_output, expected_output, atol=1e-4)
+
+
+def test_xla_fallback(monkeypatch):
+    smiles = ["CC", "NCCO", "B"]
+    expected = model.predict(smiles)
+
+    get_infer = model._get_infer
+
+    def failing_infer(inputs):
+        raise tf.errors.NotFoundError(None, None, "could not find registered platform")
+
+    def get_infer_without_xla(jit_compile=True):
+        return failing_infer if jit_compile else get_infer(jit_compile=False)
+
+    monkeypatch.setattr(model, "_get_infer", get_infer_without_xla)
+    monkeypatch.setattr(model, "_use_xla", True)
+
+    results = model.predict(smiles)
+    assert not model._use_xla
+    pd.testing.assert_frame_equal(results, expected, atol=1e-4)